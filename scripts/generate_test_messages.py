@@ -1,6 +1,8 @@
-import json
+import hashlib
 from pathlib import Path
 
+import orjson
+
 TEST_MESSAGES = [
     {
         "content": "Fixed the authentication bug in the login service. Users were getting 401 errors due to expired JWT tokens not being refreshed properly.",
@@ -109,8 +111,23 @@ def generate_test_messages():
     tests_dir.mkdir(exist_ok=True)
     
     output_file = tests_dir / "test_messages.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(TEST_MESSAGES, f, indent=2, ensure_ascii=False)
+    hash_file = tests_dir / "test_messages.json.sha256"
+    
+    digest = hashlib.sha256(
+        orjson.dumps(TEST_MESSAGES, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+    
+    if (
+        output_file.exists()
+        and hash_file.exists()
+        and hash_file.read_text(encoding='utf-8').strip() == digest
+    ):
+        print(f"✓ {output_file} is up to date ({len(TEST_MESSAGES)} messages), skipping write")
+        return
+    
+    # Same layout as json.dump(indent=2, ensure_ascii=False), encoded natively
+    output_file.write_bytes(orjson.dumps(TEST_MESSAGES, option=orjson.OPT_INDENT_2))
+    hash_file.write_text(digest, encoding='utf-8')
     
     print(f"✓ Generated {len(TEST_MESSAGES)} test messages")
     print(f"✓ Saved to: {output_file}")
@@ -1,16 +1,37 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from supabase import create_client, Client
+import numpy as np
+import orjson
 
 load_dotenv()
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase_db_url = os.getenv("SUPABASE_DB_URL")
+
+EMBEDDING_BATCH_SIZE = 512
+EMBEDDING_MAX_WORKERS = 5
+INSERT_BATCH_SIZE = 1000
+# Width of test_messages.embedding (vector(1536)); anything else is rejected before insert
+EMBEDDING_DIMENSIONS = 1536
+
+
+# openai/supabase pull in httpx, pydantic, websockets etc. Import them on first
+# use so early failures (missing fixture file) don't pay for it.
+@lru_cache(maxsize=1)
+def _get_openai():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@lru_cache(maxsize=1)
+def _get_supabase():
+    from supabase import create_client
+    return create_client(supabase_url, supabase_key)
 
 
 def load_test_messages():
@@ -31,47 +52,111 @@ def generate_embeddings(messages):
     print(f"Generating embeddings for {len(messages)} messages...")
     
     texts = [msg["content"] for msg in messages]
+    chunks = [
+        texts[i:i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    ]
     
-    try:
-        response = openai_client.embeddings.create(
+    openai_client = _get_openai()
+    
+    def embed_chunk(chunk):
+        return openai_client.embeddings.create(
             model="text-embedding-3-small",
-            input=texts
+            input=chunk
         )
+    
+    try:
+        with ThreadPoolExecutor(max_workers=EMBEDDING_MAX_WORKERS) as executor:
+            responses = list(executor.map(embed_chunk, chunks))
     except Exception as e:
         print(f"✗ OpenAI API error: {e}")
         raise
     
-    embeddings = [item.embedding for item in response.data]
-    
-    print(f"✓ Generated {len(embeddings)} embeddings")
+    # float32 matches pgvector's storage and is ~9x smaller than lists of floats.
+    # executor.map yields in submission order, so chunk i covers texts[i*BATCH:]
+    dimensions = len(responses[0].data[0].embedding)
+    if dimensions != EMBEDDING_DIMENSIONS:
+        raise ValueError(f"Expected {EMBEDDING_DIMENSIONS}-dim embeddings, got {dimensions}")
+    embeddings = np.empty((len(texts), dimensions), dtype=np.float32)
+    total_tokens = 0
+    for chunk_index, response in enumerate(responses):
+        offset = chunk_index * EMBEDDING_BATCH_SIZE
+        embeddings[offset:offset + len(response.data)] = [item.embedding for item in response.data]
+        total_tokens += response.usage.total_tokens
+    
+    # Store unit vectors so similarity over stored rows is a plain dot product
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+    
+    print(f"✓ Generated {len(embeddings)} embeddings ({len(chunks)} batches)")
     print(f"  Model: text-embedding-3-small")
     print(f"  Dimensions: {len(embeddings[0])}")
-    print(f"  Cost: ~${response.usage.total_tokens * 0.00000002:.6f}")
+    print(f"  Cost: ~${total_tokens * 0.00000002:.6f}")
     
     return embeddings
 
 
+def copy_into_postgres(messages, embeddings):
+    from kraken import bulk_copy
+    
+    print(f"Copying {len(messages)} messages into Postgres (binary COPY)...")
+    
+    try:
+        with bulk_copy.connect(supabase_db_url) as conn:
+            count = bulk_copy.copy_rows(
+                conn,
+                "test_messages",
+                columns=("content", "author", "channel", "embedding", "metadata"),
+                types=("text", "text", "text", "vector", "jsonb"),
+                rows=(
+                    (msg["content"], msg["author"], msg["channel"], embedding, {})
+                    for msg, embedding in zip(messages, embeddings)
+                )
+            )
+        
+        print(f"✓ Inserted {count} messages")
+        print(f"  Table: test_messages")
+        print(f"  Columns: content, author, channel, embedding")
+        
+        return count
+        
+    except Exception as e:
+        print(f"✗ Postgres COPY error: {e}")
+        raise
+
+
 def insert_into_supabase(messages, embeddings):
+    if supabase_db_url:
+        return copy_into_postgres(messages, embeddings)
+    
     print(f"Inserting {len(messages)} messages into Supabase...")
     
-    rows = []
-    for msg, embedding in zip(messages, embeddings):
-        rows.append({
+    supabase = _get_supabase()
+    rows = [
+        {
             "content": msg["content"],
             "author": msg["author"],
             "channel": msg["channel"],
-            "embedding": embedding,
+            # pgvector text literal straight from the float32 row; saves the
+            # .tolist() round-trip and the stdlib float formatting of 1536 values
+            "embedding": orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode(),
             "metadata": {}
-        })
+        }
+        for msg, embedding in zip(messages, embeddings)
+    ]
     
+    inserted = []
     try:
-        result = supabase.table("test_messages").insert(rows).execute()
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            result = supabase.table("test_messages").insert(
+                rows[i:i + INSERT_BATCH_SIZE]
+            ).execute()
+            inserted.extend(result.data)
         
-        print(f"✓ Inserted {len(result.data)} messages")
+        print(f"✓ Inserted {len(inserted)} messages")
         print(f"  Table: test_messages")
         print(f"  Columns: content, author, channel, embedding")
         
-        return result.data
+        return inserted
         
     except Exception as e:
         print(f"✗ Supabase insert error: {e}")
@@ -81,13 +166,22 @@ def insert_into_supabase(messages, embeddings):
 def verify_insertion():
     print("Verifying insertion...")
     
-    result = supabase.table("test_messages").select("id", count="exact").execute()
-    count = result.count
+    supabase = _get_supabase()
+    
+    # Count and sample are independent, so run both round-trips at once
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        count_future = executor.submit(
+            lambda: supabase.table("test_messages").select("id", count="exact").execute()
+        )
+        sample_future = executor.submit(
+            lambda: supabase.table("test_messages").select("content, author, embedding").limit(1).execute()
+        )
+        count = count_future.result().count
+        sample = sample_future.result()
     
     print(f"✓ Verification passed")
     print(f"  Total rows in test_messages: {count}")
     
-    sample = supabase.table("test_messages").select("content, author, embedding").limit(1).execute()
     if sample.data:
         row = sample.data[0]
         has_embedding = row.get("embedding") is not None
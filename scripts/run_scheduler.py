@@ -5,15 +5,35 @@ import sys
 import signal
 import argparse
 import logging
+import logging.handlers
+import queue
+import re
 from pathlib import Path
 from typing import List
 
 from kraken.scheduler import SyncScheduler
+from kraken.slack_sync import load_user_cache, save_user_cache
 from kraken.config import config
 
+USER_CACHE_FILE = Path('logs') / 'user_cache.json'
+
+# Slack conversation IDs: C (public), G (private/group), D (DM) + uppercase alphanumerics
+_CHAN_RE = re.compile(r"^[CDG][A-Z0-9]{8,}$")
+
+
+# Background thread that performs the actual log I/O (see setup_logging)
+_log_listener = None
+
 
 def setup_logging(log_file: Path = None) -> None:
-    """Configure dual logging (file + console)."""
+    """
+    Configure dual logging (rotating file + console).
+    
+    Log calls only enqueue the record; a QueueListener thread does the file
+    and console writes, so sync jobs never block on log I/O.
+    """
+    global _log_listener
+    
     log_file = log_file or Path('logs') / 'sync.log'
     log_file.parent.mkdir(parents=True, exist_ok=True)
     
@@ -22,7 +42,11 @@ def setup_logging(log_file: Path = None) -> None:
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
-    file_handler = logging.FileHandler(log_file)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=10_000_000,
+        backupCount=5
+    )
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(formatter)
     
@@ -30,10 +54,27 @@ def setup_logging(log_file: Path = None) -> None:
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
     
+    log_queue = queue.Queue(-1)
+    
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    _log_listener = logging.handlers.QueueListener(
+        log_queue,
+        file_handler,
+        console_handler,
+        respect_handler_level=True
+    )
+    _log_listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued log records and stop the listener thread."""
+    global _log_listener
+    if _log_listener:
+        _log_listener.stop()
+        _log_listener = None
 
 
 def parse_args() -> argparse.Namespace:
@@ -49,6 +90,10 @@ def parse_args() -> argparse.Namespace:
         help='Sync interval in MINUTES (overrides SYNC_INTERVAL_HOURS, accepts 1-1440)'
     )
     parser.add_argument('--log-file', type=Path, help='Log file path')
+    parser.add_argument(
+        '--jobs-db',
+        help='Keep jobs in this SQLite file (APScheduler job store) instead of in memory; replaces .cache/schedule.json'
+    )
     return parser.parse_args()
 
 
@@ -71,7 +116,16 @@ def get_channels(args: argparse.Namespace) -> List[str]:
     
     # Priority 1: CLI argument
     if args.channels:
-        channels = [ch.strip() for ch in args.channels.split(',') if ch.strip()]
+        requested = [ch.strip() for ch in args.channels.split(',') if ch.strip()]
+        channels = [ch for ch in requested if _CHAN_RE.match(ch)]
+        
+        rejected = [ch for ch in requested if ch not in channels]
+        if rejected:
+            logger.error(f"Ignoring malformed channel IDs: {rejected} (expected e.g. C0A474TT6CU)")
+        if not channels:
+            logger.error("No valid channel IDs in --channels")
+            sys.exit(1)
+        
         logger.info(f"Using channels from CLI argument: {channels}")
         return channels
     
@@ -125,7 +179,11 @@ _scheduler = None
 
 
 def signal_handler(signum, frame):
-    """Handle Ctrl+C and termination signals."""
+    """Handle Ctrl+C and termination signals.
+
+    Only stops the scheduler; main()'s finally saves the user cache and
+    stops logging, exactly once.
+    """
     global _scheduler
     logger = logging.getLogger(__name__)
     logger.info("\nShutdown signal received")
@@ -165,9 +223,14 @@ def main() -> None:
     logger.info(f"Channels: {', '.join(channels)}")
     logger.info("")
     
+    # Warm restart: reuse user names resolved in the last 24h
+    cached_users = load_user_cache(USER_CACHE_FILE)
+    if cached_users:
+        logger.info(f"Loaded {cached_users} cached Slack users from {USER_CACHE_FILE}")
+    
     # Create scheduler
     try:
-        _scheduler = SyncScheduler()
+        _scheduler = SyncScheduler(db_path=args.jobs_db)
     except Exception as e:
         logger.error(f"Failed to initialize: {e}")
         sys.exit(2)
@@ -181,17 +244,22 @@ def main() -> None:
             logger.error(f"✗ Failed to schedule {channel_id}: {e}")
             # Continue with other channels (degraded mode)
     
-    # Register signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    logger.info("")
-    logger.info("Press Ctrl+C to stop")
-    logger.info("="*60)
-    logger.info("")
-    
-    # Start (blocks until Ctrl+C)
-    _scheduler.start()
+    # Save resolved users and flush logs on every exit path, signals included
+    try:
+        # Register signal handlers
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+        
+        logger.info("")
+        logger.info("Press Ctrl+C to stop")
+        logger.info("="*60)
+        logger.info("")
+        
+        # Start (blocks until Ctrl+C)
+        _scheduler.start()
+    finally:
+        save_user_cache(USER_CACHE_FILE)
+        stop_logging()
 
 
 if __name__ == '__main__':
@@ -1,3 +1,4 @@
+import importlib.util
 import json
 import os
 import sys
@@ -31,19 +32,19 @@ class ClaudeConfigManager:
             errors.append(f"MCP server not found: {mcp_server}")
             errors.append("Expected: src/kraken/mcp_server.py")
         
-        uv_check = os.system('uv --version >nul 2>&1')
-        if uv_check != 0:
+        if shutil.which('uv') is None:
             errors.append("uv not found in PATH")
             errors.append("Install: https://docs.astral.sh/uv/getting-started/installation/")
         
+        # find_spec locates the module without executing it (importing
+        # mcp_server would load config and open API clients)
         try:
-            sys.path.insert(0, str(self.project_root / 'src'))
-            import kraken.mcp_server
-        except ImportError as e:
-            errors.append(f"Cannot import kraken.mcp_server: {e}")
+            spec = importlib.util.find_spec('kraken.mcp_server')
+        except ImportError:
+            spec = None
+        if spec is None:
+            errors.append("Cannot import kraken.mcp_server (package not installed)")
             errors.append("Run: uv sync")
-        finally:
-            sys.path.pop(0)
         
         return (len(errors) == 0, errors)
     
@@ -92,27 +93,16 @@ class ClaudeConfigManager:
             print(f"✗ Write failed: {e}")
             return False
     
-    def validate_config(self) -> tuple[bool, list[str]]:
+    def validate_dict(self, config: Dict[str, Any]) -> tuple[bool, list[str]]:
         errors = []
         
-        if not self.config_path.exists():
-            errors.append("Config file not found after write")
-            return (False, errors)
-        
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                loaded_config = json.load(f)
-        except json.JSONDecodeError as e:
-            errors.append(f"Invalid JSON: {e}")
-            return (False, errors)
-        
-        if 'mcpServers' not in loaded_config:
+        if 'mcpServers' not in config:
             errors.append("Missing 'mcpServers' key")
         
-        if 'kraken' not in loaded_config.get('mcpServers', {}):
+        if 'kraken' not in config.get('mcpServers', {}):
             errors.append("Missing 'kraken' server config")
         
-        kraken_config = loaded_config.get('mcpServers', {}).get('kraken', {})
+        kraken_config = config.get('mcpServers', {}).get('kraken', {})
         
         if 'command' not in kraken_config:
             errors.append("Missing 'command' in kraken config")
@@ -134,6 +124,18 @@ class ClaudeConfigManager:
         
         return (len(errors) == 0, errors)
     
+    def validate_on_disk(self) -> tuple[bool, list[str]]:
+        if not self.config_path.exists():
+            return (False, ["Config file not found"])
+        
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                loaded_config = json.load(f)
+        except json.JSONDecodeError as e:
+            return (False, [f"Invalid JSON: {e}"])
+        
+        return self.validate_dict(loaded_config)
+    
     def restore_backup(self) -> bool:
         if not self.backup_path.exists():
             print("✗ No backup found")
@@ -181,7 +183,11 @@ class ClaudeConfigManager:
         print()
         
         print("[5/5] Validating written config...")
-        valid, errors = self.validate_config()
+        # write_config serialized this exact dict; no need to read it back
+        if not self.config_path.exists():
+            valid, errors = (False, ["Config file not found after write"])
+        else:
+            valid, errors = self.validate_dict(config)
         if not valid:
             print("✗ Validation failed:")
             for error in errors:
@@ -226,7 +232,7 @@ def main():
         sys.exit(0 if success else 1)
     
     if args.test:
-        valid, errors = manager.validate_config()
+        valid, errors = manager.validate_on_disk()
         if not valid:
             print("✗ Config validation failed:")
             for error in errors:
@@ -0,0 +1,38 @@
+"""Numba-compiled similarity kernel for environments without SimSIMD.
+
+Candidate rows and the query are unit-normalized before they get here, so
+cosine similarity reduces to a dot product and no norms are recomputed per call.
+Importing this module compiles (or loads from cache) and warms the kernel so
+the first search does not pay for JIT compilation.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+WARMUP_DIMENSIONS = 1536
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def dot_v2m(q, M, out):
+    for i in prange(M.shape[0]):
+        s = np.float32(0.0)
+        for k in range(M.shape[1]):
+            s += q[k] * M[i, k]
+        out[i] = s
+
+
+def cosine_similarities(matrix: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Similarity of a unit query against every unit row of matrix (float32)."""
+    out = np.empty(matrix.shape[0], dtype=np.float32)
+    dot_v2m(
+        np.ascontiguousarray(query_vec, dtype=np.float32),
+        np.ascontiguousarray(matrix, dtype=np.float32),
+        out
+    )
+    return out
+
+
+cosine_similarities(
+    np.zeros((1, WARMUP_DIMENSIONS), dtype=np.float32),
+    np.zeros(WARMUP_DIMENSIONS, dtype=np.float32)
+)
@@ -0,0 +1,172 @@
+"""Bulk writes over a direct Postgres connection using binary COPY.
+
+PostgREST ships each embedding as ~20KB of JSON that Postgres then reparses.
+COPY ... (FORMAT BINARY) sends pgvector's binary wire format instead, so large
+loads are bound by the network rather than by JSON parsing.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, Sequence
+
+import psycopg
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+from pgvector.psycopg import register_vector
+
+logger = logging.getLogger(__name__)
+
+POOL_MAX_SIZE = 4
+STATEMENT_TIMEOUT = '30s'
+IDLE_IN_TRANSACTION_TIMEOUT = '60s'
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def connect(dsn: str) -> psycopg.Connection:
+    """Open a connection with pgvector types registered.
+
+    Server-side prepared statements are disabled so the DSN may point at a
+    transaction-mode pooler (Supavisor port 6543) as well as a direct connection.
+    """
+    conn = psycopg.connect(dsn, prepare_threshold=None)
+    register_vector(conn)
+    return conn
+
+
+def _configure_pooled(conn: psycopg.Connection) -> None:
+    register_vector(conn)
+    conn.commit()
+
+
+def get_pool(dsn: str) -> ConnectionPool:
+    """Process-wide connection pool for dsn, created on first use.
+
+    Meant for long-running processes (the scheduler) pointed at Supavisor in
+    transaction mode: backend connections stay bounded by POOL_MAX_SIZE no
+    matter how many channel jobs run at once.
+    """
+    with _pools_lock:
+        pool = _pools.get(dsn)
+        if pool is None:
+            pool = ConnectionPool(
+                dsn,
+                min_size=1,
+                max_size=POOL_MAX_SIZE,
+                kwargs={'prepare_threshold': None},
+                configure=_configure_pooled,
+                name='kraken',
+                open=True
+            )
+            _pools[dsn] = pool
+            logger.info(f"Postgres pool opened (max_size={POOL_MAX_SIZE})")
+        return pool
+
+
+def close_pools() -> None:
+    """Close every pool opened by get_pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def pool_stats(pool: ConnectionPool) -> str:
+    """One-line summary of pool usage for per-tick logging."""
+    stats = pool.get_stats()
+    return (
+        f"size={stats.get('pool_size', 0)} "
+        f"available={stats.get('pool_available', 0)} "
+        f"waiting={stats.get('requests_waiting', 0)} "
+        f"errors={stats.get('connections_errors', 0)}"
+    )
+
+
+def _apply_timeouts(cur: psycopg.Cursor) -> None:
+    # SET LOCAL rather than connection options: transaction-mode poolers share
+    # backends between clients, so settings must live inside the transaction.
+    cur.execute(sql.SQL("SET LOCAL statement_timeout = {}").format(sql.Literal(STATEMENT_TIMEOUT)))
+    cur.execute(sql.SQL("SET LOCAL idle_in_transaction_session_timeout = {}").format(
+        sql.Literal(IDLE_IN_TRANSACTION_TIMEOUT)
+    ))
+
+
+def _copy_into(
+    cur: psycopg.Cursor,
+    table: str,
+    columns: Sequence[str],
+    types: Sequence[str],
+    rows: Iterable[Sequence]
+) -> None:
+    statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+
+    with cur.copy(statement) as copy:
+        copy.set_types(list(types))
+        for row in rows:
+            copy.write_row(row)
+
+
+def copy_rows(
+    conn: psycopg.Connection,
+    table: str,
+    columns: Sequence[str],
+    types: Sequence[str],
+    rows: Iterable[Sequence]
+) -> int:
+    """Append rows to table with binary COPY. Returns rows written."""
+    with conn.transaction(), conn.cursor() as cur:
+        _apply_timeouts(cur)
+        _copy_into(cur, table, columns, types, rows)
+        count = cur.rowcount
+
+    logger.debug(f"COPY {table}: {count} rows")
+    return count
+
+
+def upsert_rows(
+    conn: psycopg.Connection,
+    table: str,
+    columns: Sequence[str],
+    types: Sequence[str],
+    rows: Iterable[Sequence],
+    conflict_column: str
+) -> int:
+    """Upsert rows via COPY into a temp table, then INSERT ... ON CONFLICT. Returns rows written."""
+    staging = f"_copy_{table}"
+    column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+    updates = sql.SQL(', ').join(
+        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col))
+        for col in columns
+        if col != conflict_column
+    )
+
+    with conn.transaction(), conn.cursor() as cur:
+        _apply_timeouts(cur)
+        cur.execute(
+            sql.SQL(
+                "CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP"
+            ).format(sql.Identifier(staging), sql.Identifier(table))
+        )
+
+        _copy_into(cur, staging, columns, types, rows)
+
+        cur.execute(
+            sql.SQL(
+                "INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} "
+                "ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+            ).format(
+                table=sql.Identifier(table),
+                cols=column_list,
+                staging=sql.Identifier(staging),
+                conflict=sql.Identifier(conflict_column),
+                updates=updates
+            )
+        )
+        count = cur.rowcount
+
+    logger.debug(f"COPY upsert {table}: {count} rows")
+    return count
@@ -1,40 +1,73 @@
 """Configuration management for Kraken."""
 
 import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Callable, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Repository root (src/kraken/config.py -> ../..); relative CACHE_DIR values are
+# anchored here so every process shares one cache whatever its working directory
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
+
+def _env(name: str, default: str = "") -> Callable[[], str]:
+    return lambda: os.getenv(name, default)
+
+
+def _project_path(value: str) -> Path:
+    path = Path(value)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Application configuration with validation."""
-
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_EMBEDDING_MODEL: str = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-    SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
-    SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY", "")
-    SLACK_BOT_TOKEN: str = os.getenv("SLACK_BOT_TOKEN", "")
-    SYNC_CHANNELS: str = os.getenv("SYNC_CHANNELS", "")
-    SYNC_INTERVAL_HOURS: int = int(os.getenv("SYNC_INTERVAL_HOURS", "60"))
-    CACHE_DIR: Path = Path(os.getenv("CACHE_DIR", ".cache"))
-    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
-    DEFAULT_SEARCH_LIMIT: int = int(os.getenv("DEFAULT_SEARCH_LIMIT", "5"))
-    MIN_SIMILARITY_THRESHOLD: float = float(os.getenv("MIN_SIMILARITY_THRESHOLD", "0.35"))
-    
+    """Application configuration with validation.
+
+    Environment variables are read once, when the instance is created.
+    """
+
+    OPENAI_API_KEY: str = field(default_factory=_env("OPENAI_API_KEY"), repr=False)
+    OPENAI_EMBEDDING_MODEL: str = field(default_factory=_env("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+    EMBEDDING_DIMENSIONS: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_DIMENSIONS", "1536")))
+    SUPABASE_URL: str = field(default_factory=_env("SUPABASE_URL"))
+    SUPABASE_SERVICE_KEY: str = field(default_factory=_env("SUPABASE_SERVICE_KEY"), repr=False)
+    SUPABASE_DB_URL: str = field(default_factory=_env("SUPABASE_DB_URL"), repr=False)
+    SUPAVISOR_URL: str = field(default_factory=_env("SUPAVISOR_URL"), repr=False)
+    SLACK_BOT_TOKEN: str = field(default_factory=_env("SLACK_BOT_TOKEN"), repr=False)
+    SYNC_CHANNELS: str = field(default_factory=_env("SYNC_CHANNELS"))
+    SYNC_INTERVAL_HOURS: int = field(default_factory=lambda: int(os.getenv("SYNC_INTERVAL_HOURS", "60")))
+    CACHE_DIR: Path = field(default_factory=lambda: _project_path(os.getenv("CACHE_DIR", ".cache")))
+    EMBEDDING_CACHE_ENABLED: bool = field(
+        default_factory=lambda: os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    )
+    DEFAULT_SEARCH_LIMIT: int = field(default_factory=lambda: int(os.getenv("DEFAULT_SEARCH_LIMIT", "5")))
+    MIN_SIMILARITY_THRESHOLD: float = field(
+        default_factory=lambda: float(os.getenv("MIN_SIMILARITY_THRESHOLD", "0.35"))
+    )
+    _sync_channels: Tuple[str, ...] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        channels = tuple(ch.strip() for ch in self.SYNC_CHANNELS.split(',') if ch.strip())
+        object.__setattr__(self, '_sync_channels', channels)
+
     @property
-    def sync_channels_list(self) -> List[str]:
-        """Parse comma-separated channel IDs into list."""
-        if not self.SYNC_CHANNELS:
-            return []
-        return [ch.strip() for ch in self.SYNC_CHANNELS.split(',') if ch.strip()]
-    
+    def sync_channels_list(self) -> Tuple[str, ...]:
+        """Channel IDs from comma-separated SYNC_CHANNELS, parsed once."""
+        return self._sync_channels
+
+    @property
+    def messages_updated_file(self) -> Path:
+        """Touched whenever slack_messages rows are written; readers watch its mtime."""
+        return self.CACHE_DIR / 'messages_updated'
+
     @property
     def sync_interval_minutes(self) -> int:
         """Get sync interval in minutes."""
         return self.SYNC_INTERVAL_HOURS
-    
+
     def validate(self) -> None:
         """Validate required configuration."""
         errors = []
@@ -1,87 +1,248 @@
-import json
+import atexit
 import hashlib
+import sqlite3
+import threading
 import time
 from pathlib import Path
-from typing import Optional, Tuple, List
-from openai import OpenAI, OpenAIError
+from typing import Awaitable, Callable, Dict, Optional, Tuple, List
+import numpy as np
+import orjson
+from openai import AsyncOpenAI, OpenAIError
 
 from kraken.config import config
-from kraken.retry import with_retry
+
+CACHE_FLUSH_INTERVAL_SECONDS = 30
+# Keys per IN (...) lookup; stays under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
 
 class EmbeddingCache:
+    """
+    SQLite-backed embedding cache keyed by hash of (model, text).
+
+    Vectors are stored as raw float32 bytes, one row per key, so an insert is
+    a single-row write instead of re-serializing the whole cache. Writes are
+    committed at most every CACHE_FLUSH_INTERVAL_SECONDS and at exit.
+    """
+
     def __init__(self, cache_file: Path):
         self.cache_file = cache_file
-        self.cache: dict = {}
         self.hits = 0
         self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
         self._load()
+        atexit.register(self._save)
 
     def _load(self):
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    self.cache = json.load(f)
-            except Exception:
-                self.cache = {}
-        else:
-            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.cache_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, text TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, timestamp INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._import_legacy(self.cache_file.with_suffix(".json"))
 
-    def _save(self):
+    def _import_legacy(self, legacy_file: Path):
+        """One-time move of entries from the old JSON cache into SQLite."""
+        if not legacy_file.exists():
+            return
+        if self._conn.execute("SELECT 1 FROM embeddings LIMIT 1").fetchone():
+            return
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f)
+            legacy = orjson.loads(legacy_file.read_bytes())
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, text, embedding, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        self.key(entry["text"], entry["model"]),
+                        entry["model"],
+                        entry["text"],
+                        np.asarray(entry["embedding"], dtype=np.float32).tobytes(),
+                        entry.get("timestamp", int(time.time()))
+                    )
+                    for entry in legacy.values()
+                )
+            )
+            self._conn.commit()
         except Exception:
             pass
 
-    def _key(self, text: str, model: str) -> str:
-        return hashlib.sha256(f"{model}:{text}".encode()).hexdigest()
+    def _save(self):
+        with self._lock:
+            self._flush_timer = None
+            if self._dirty:
+                self._conn.commit()
+                self._dirty = False
+
+    def key(self, text: str, model: str) -> str:
+        return hashlib.blake2b(f"{model}:{text}".encode(), digest_size=16).hexdigest()
 
     def get(self, text: str, model: str) -> Optional[List[float]]:
-        key = self._key(text, model)
-        if key in self.cache:
+        return self._lookup(self.key(text, model))
+
+    def set(self, text: str, model: str, embedding: List[float]):
+        self._store(self.key(text, model), text, model, embedding)
+
+    async def get_or_compute(
+        self,
+        text: str,
+        model: str,
+        compute: Callable[[], Awaitable[List[float]]]
+    ) -> Tuple[List[float], bool]:
+        """Cached embedding for (text, model), or await compute() and store it.
+
+        Hashes the key once for both the lookup and the insert. Returns
+        (embedding, cache_hit).
+        """
+        key = self.key(text, model)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached, True
+        embedding = await compute()
+        self._store(key, text, model, embedding)
+        return embedding, False
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is not None:
             self.hits += 1
-            return self.cache[key]["embedding"]
+            return np.frombuffer(row[0], dtype=np.float32).tolist()
         self.misses += 1
         return None
 
-    def set(self, text: str, model: str, embedding: List[float]):
-        key = self._key(text, model)
-        self.cache[key] = {
-            "text": text,
-            "embedding": embedding,
-            "model": model,
-            "timestamp": int(time.time())
-        }
-        self._save()
+    def _store(self, key: str, text: str, model: str, embedding: List[float]):
+        self.set_many([key], [text], model, [embedding])
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings for keys (from key()), in order, None for misses.
+
+        One SELECT ... WHERE key IN (...) per LOOKUP_CHUNK keys.
+        """
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def set_many(self, keys: List[str], texts: List[str], model: str, embeddings: List[List[float]]):
+        now = int(time.time())
+        rows = [
+            (key, model, text, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for key, text, embedding in zip(keys, texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, text, embedding, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(CACHE_FLUSH_INTERVAL_SECONDS, self._save)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
 
 
-_cache = EmbeddingCache(config.CACHE_DIR / "embeddings.json") if config.EMBEDDING_CACHE_ENABLED else None
+embedding_cache = EmbeddingCache(config.CACHE_DIR / "embeddings.sqlite") if config.EMBEDDING_CACHE_ENABLED else None
+
+# One client per process so concurrent callers share its connection pool
+# (keep-alive, no TLS handshake per miss). The SDK retries 429/5xx/connection
+# errors with backoff without blocking the loop; the timeout bounds a hung call.
+OPENAI_MAX_RETRIES = 2
+OPENAI_TIMEOUT_SECONDS = 30.0
+
+_aclient = AsyncOpenAI(
+    api_key=config.OPENAI_API_KEY,
+    max_retries=OPENAI_MAX_RETRIES,
+    timeout=OPENAI_TIMEOUT_SECONDS
+)
 
 
 async def generate_embedding(text: str, model: Optional[str] = None) -> Tuple[List[float], float, bool]:
     start = time.time()
     model = model or config.OPENAI_EMBEDDING_MODEL
 
-    if _cache:
-        cached = _cache.get(text, model)
-        if cached:
-            latency = (time.time() - start) * 1000
-            return cached, latency, True
+    async def create() -> List[float]:
+        response = await _aclient.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
 
     try:
-        client = OpenAI(api_key=config.OPENAI_API_KEY)
-        response = with_retry(
-            lambda: client.embeddings.create(model=model, input=text),
-            max_retries=3,
-            operation_name="OpenAI embeddings.create (MCP search)"
-        )
-        embedding = response.data[0].embedding
-
-        if _cache:
-            _cache.set(text, model, embedding)
-
-        latency = (time.time() - start) * 1000
-        return embedding, latency, False
+        if embedding_cache:
+            embedding, cache_hit = await embedding_cache.get_or_compute(text, model, create)
+        else:
+            embedding, cache_hit = await create(), False
     except OpenAIError as e:
         print(f"OpenAI API error: {e}")
         raise
+
+    latency = (time.time() - start) * 1000
+    return embedding, latency, cache_hit
+
+
+async def generate_embeddings(
+    texts: List[str],
+    model: Optional[str] = None
+) -> Tuple[List[List[float]], float, List[bool]]:
+    """Embed several texts with one API call for all cache misses.
+
+    Returns (embeddings in input order, latency_ms, per-text cache hit flags).
+    """
+    start = time.time()
+    model = model or config.OPENAI_EMBEDDING_MODEL
+
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    keys = [embedding_cache.key(text, model) for text in texts] if embedding_cache else []
+    if embedding_cache:
+        embeddings = embedding_cache.get_many(keys)
+    cache_hits = [embedding is not None for embedding in embeddings]
+
+    # Distinct missing texts -> their input positions, so repeats are embedded once
+    positions: Dict[str, List[int]] = {}
+    for i, hit in enumerate(cache_hits):
+        if not hit:
+            positions.setdefault(texts[i], []).append(i)
+
+    if positions:
+        unique_texts = list(positions)
+        try:
+            response = await _aclient.embeddings.create(
+                model=model,
+                input=unique_texts
+            )
+        except OpenAIError as e:
+            print(f"OpenAI API error: {e}")
+            raise
+
+        new_embeddings = [item.embedding for item in response.data]
+        for text, embedding in zip(unique_texts, new_embeddings):
+            for i in positions[text]:
+                embeddings[i] = embedding
+        if embedding_cache:
+            embedding_cache.set_many(
+                [keys[positions[text][0]] for text in unique_texts],
+                unique_texts,
+                model,
+                new_embeddings
+            )
+
+    latency = (time.time() - start) * 1000
+    return embeddings, latency, cache_hits
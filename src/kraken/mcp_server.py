@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Any
 import time
@@ -9,6 +10,7 @@ from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 from kraken.embeddings import generate_embedding
+from kraken.semantic_cache import SemanticCache
 from kraken.vector_store import vector_store
 from kraken.config import config
 
@@ -21,6 +23,54 @@ logger = logging.getLogger(__name__)
 
 server = Server("kraken")
 
+# Characters of message content shown per search result
+SNIPPET_CHARS = 200
+
+# Process-local LRU of query embeddings, in front of the on-disk cache: repeat
+# searches skip both the OpenAI call and the SQLite lookup.
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+_query_embeddings: "OrderedDict[tuple[str, str], list[float]]" = OrderedDict()
+_query_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+# Results for near-duplicate queries, dropped whenever any sync (scheduler or
+# scripts/sync_slack.py) stores messages, or after 15 minutes.
+_semantic_cache = SemanticCache(
+    dimensions=config.EMBEDDING_DIMENSIONS,
+    threshold=0.95,
+    ttl_seconds=900,
+    invalidate_on=config.messages_updated_file
+)
+
+
+async def embed_query(query: str) -> tuple[list[float], float, bool]:
+    """Embedding for query as (embedding, latency_ms, cache_hit).
+
+    Keyed by model and whitespace/case-normalized query. Concurrent misses for
+    the same key wait on one lock, so only the first generates the embedding.
+    """
+    key = (config.OPENAI_EMBEDDING_MODEL, " ".join(query.split()).lower())
+
+    embedding = _query_embeddings.get(key)
+    if embedding is not None:
+        _query_embeddings.move_to_end(key)
+        return embedding, 0.0, True
+
+    lock = _query_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            embedding = _query_embeddings.get(key)
+            if embedding is not None:
+                return embedding, 0.0, True
+
+            embedding, latency, cache_hit = await generate_embedding(query)
+            _query_embeddings[key] = embedding
+            if len(_query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embeddings.popitem(last=False)
+            return embedding, latency, cache_hit
+    finally:
+        if not lock.locked():
+            _query_locks.pop(key, None)
+
 
 @server.list_tools()
 async def list_tools() -> list[Tool]:
@@ -109,18 +159,23 @@ async def handle_search_messages(arguments: dict) -> list[TextContent]:
 
     try:
         start_embed = time.time()
-        embedding, embed_latency, cache_hit = await generate_embedding(query)
+        embedding, embed_latency, cache_hit = await embed_query(query)
         cache_status = "cached" if cache_hit else "generated"
         logger.info(f"Embedding {cache_status} in {embed_latency:.0f}ms")
 
         start_search = time.time()
-        results = vector_store.search(
-            query_embedding=embedding,
-            limit=limit,
-            min_similarity=config.MIN_SIMILARITY_THRESHOLD
-        )
-        search_latency = (time.time() - start_search) * 1000
-        logger.info(f"Search completed in {search_latency:.0f}ms, found {len(results)} results")
+        results = _semantic_cache.get(embedding, limit)
+        if results is not None:
+            logger.info(f"Search served from semantic cache, {len(results)} results")
+        else:
+            results = await vector_store.search_async(
+                query_embedding=embedding,
+                limit=limit,
+                min_similarity=config.MIN_SIMILARITY_THRESHOLD
+            )
+            _semantic_cache.put(embedding, limit, results)
+            search_latency = (time.time() - start_search) * 1000
+            logger.info(f"Search completed in {search_latency:.0f}ms, found {len(results)} results")
 
         if not results:
             return [
@@ -130,20 +185,19 @@ async def handle_search_messages(arguments: dict) -> list[TextContent]:
                 )
             ]
 
-        response_lines = [
-            f"Found {len(results)} relevant messages for '{query}':",
-            ""
-        ]
+        # One string per result (header, snippet, blank line) rather than three list items
+        response_parts = [f"Found {len(results)} relevant messages for '{query}':\n"]
 
         for i, result in enumerate(results, 1):
-            similarity_pct = result["similarity"] * 100
-            response_lines.extend([
-                f"**{i}. {result['author']}** in #{result['channel']} (relevance: {similarity_pct:.0f}%)",
-                f"{result['content'][:200]}{'...' if len(result['content']) > 200 else ''}",
-                ""
-            ])
-
-        response_text = "\n".join(response_lines)
+            content = result['content']
+            tail = '...' if len(content) > SNIPPET_CHARS else ''
+            response_parts.append(
+                f"**{i}. {result['author']}** in #{result['channel']} "
+                f"(relevance: {result['similarity']:.0%})\n"
+                f"{content[:SNIPPET_CHARS]}{tail}\n"
+            )
+
+        response_text = "\n".join(response_parts)
 
         return [
             TextContent(
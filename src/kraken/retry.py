@@ -1,8 +1,11 @@
 """Retry utilities for handling transient API failures."""
 
+import asyncio
+import random
+import re
 import time
 import logging
-from typing import Callable, TypeVar
+from typing import Awaitable, Callable, TypeVar
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +18,7 @@ TRANSIENT_KEYWORDS = (
     'connection',
     'timeout',
     'temporary',
+    '429',
     '503',
     '502',
     '504',
@@ -22,16 +26,50 @@ TRANSIENT_KEYWORDS = (
     'readtimeout',
 )
 
+# One alternation instead of a substring scan per keyword; IGNORECASE saves lowercasing
+_TRANSIENT_RE = re.compile('|'.join(map(re.escape, TRANSIENT_KEYWORDS)), re.IGNORECASE)
+
 
 def is_transient_error(error: Exception) -> bool:
     """Determine if error is transient (should retry)."""
-    error_str = str(error).lower()
-    error_type = type(error).__name__.lower()
+    return bool(
+        _TRANSIENT_RE.search(type(error).__name__)
+        or _TRANSIENT_RE.search(str(error))
+    )
 
-    return any(
-        keyword in error_str or keyword in error_type
-        for keyword in TRANSIENT_KEYWORDS
+
+def _backoff_delay(
+    error: Exception,
+    attempt: int,
+    max_retries: int,
+    backoff_base: float,
+    operation_name: str
+) -> float:
+    """Seconds to wait before the next attempt; re-raises error if it should not be retried.
+
+    Full jitter (uniform in [0, backoff_base ** attempt]) keeps callers that
+    failed together, e.g. several channel syncs hitting one rate limit, from
+    retrying in lockstep.
+    """
+    if not is_transient_error(error):
+        logger.warning(
+            f"{operation_name} failed with permanent error: {error}"
+        )
+        raise error
+
+    if attempt >= max_retries - 1:
+        logger.error(
+            f"{operation_name} failed after {max_retries} attempts: {error}"
+        )
+        raise error
+
+    delay = random.uniform(0, backoff_base ** attempt)
+
+    logger.warning(
+        f"{operation_name} failed (attempt {attempt + 1}/{max_retries}), "
+        f"retrying in {delay:.1f}s: {error}"
     )
+    return delay
 
 
 def with_retry(
@@ -49,26 +87,26 @@ def with_retry(
 
         except Exception as e:
             last_error = e
+            time.sleep(_backoff_delay(e, attempt, max_retries, backoff_base, operation_name))
 
-            if not is_transient_error(e):
-                logger.warning(
-                    f"{operation_name} failed with permanent error: {e}"
-                )
-                raise
+    raise last_error
 
-            if attempt >= max_retries - 1:
-                logger.error(
-                    f"{operation_name} failed after {max_retries} attempts: {e}"
-                )
-                raise
 
-            delay = backoff_base ** attempt
+async def with_retry_async(
+    func: Callable[[], Awaitable[T]],
+    max_retries: int = 3,
+    backoff_base: float = 2.0,
+    operation_name: str = "operation"
+) -> T:
+    """Async with_retry: awaits func() and backs off with asyncio.sleep, so the event loop keeps running."""
+    last_error = None
 
-            logger.warning(
-                f"{operation_name} failed (attempt {attempt + 1}/{max_retries}), "
-                f"retrying in {delay:.1f}s: {e}"
-            )
+    for attempt in range(max_retries):
+        try:
+            return await func()
 
-            time.sleep(delay)
+        except Exception as e:
+            last_error = e
+            await asyncio.sleep(_backoff_delay(e, attempt, max_retries, backoff_base, operation_name))
 
     raise last_error
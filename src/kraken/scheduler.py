@@ -6,26 +6,50 @@ from datetime import datetime
 from pathlib import Path
 from apscheduler.schedulers.background import BackgroundScheduler
 from kraken.sync_tracker import SyncTracker
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from kraken import bulk_copy
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
 import time
+from concurrent import futures
+from functools import lru_cache
+from typing import Optional
 
 
 logger = logging.getLogger(__name__)
 _tracker = SyncTracker()
 
+# Channel -> interval_minutes for the in-memory job store, re-added on startup
+SCHEDULE_FILE = Path('.cache') / 'schedule.json'
 
-def sync_job(channel_id: str):
-    """Scheduled sync job: fetch, enrich, embed, and store Slack messages."""
+
+def _get_db_pool():
+    """Shared Supavisor pool when SUPAVISOR_URL is set, else None (per-call connections / PostgREST)."""
+    from kraken.config import config
+
+    if not config.SUPAVISOR_URL:
+        return None
+    return bulk_copy.get_pool(config.SUPAVISOR_URL)
+
+
+@lru_cache(maxsize=1)
+def _get_service():
+    """One SlackSyncService for every tick and channel, so Slack/OpenAI/Supabase
+    HTTP connections are reused instead of rebuilt per sync."""
     from kraken.slack_sync import SlackSyncService
     from kraken.config import config
 
+    return SlackSyncService(config.SLACK_BOT_TOKEN, db_pool=_get_db_pool())
+
+
+def sync_job(channel_id: str):
+    """Scheduled sync job: fetch, enrich, embed, and store Slack messages."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     logger.info(f"[{timestamp}] Sync started: channel={channel_id}")
 
     try:
-        service = SlackSyncService(config.SLACK_BOT_TOKEN)
+        db_pool = _get_db_pool()
+        service = _get_service()
 
         sync_state_file = Path('.cache/slack_sync_state.json')
         sync_state = {}
@@ -44,37 +68,49 @@ def sync_job(channel_id: str):
         else:
             logger.info(f"  Full sync (first time)")
 
-        all_messages = []
+        total_fetched = 0
         cursor = None
         page_count = 0
 
-        while True:
-            messages, cursor = service.fetch_messages(
-                channel_id,
-                oldest=last_ts,
-                cursor=cursor,
-                limit=100
-            )
-            all_messages.extend(messages)
-            page_count += 1
+        # users.list runs alongside the first conversations.history call, and
+        # each page is enriched in the background while the next one is fetched
+        with futures.ThreadPoolExecutor(max_workers=2) as pool:
+            user_map_ready = pool.submit(service.warm_user_cache)
+
+            def enrich_page(page: list) -> list:
+                user_map_ready.result()
+                return service.enrich_messages(page, channel_id)
+
+            enriched_pages = []
+            while True:
+                messages, cursor = service.fetch_messages(
+                    channel_id,
+                    oldest=last_ts,
+                    cursor=cursor,
+                    limit=100
+                )
+                total_fetched += len(messages)
+                page_count += 1
+                enriched_pages.append(pool.submit(enrich_page, messages))
 
-            logger.info(f"  Page {page_count}: fetched {len(messages)} messages")
+                logger.info(f"  Page {page_count}: fetched {len(messages)} messages")
 
-            if not cursor:
-                break
+                if not cursor:
+                    break
 
-            if page_count >= 10:
-                logger.warning(f"  Reached page limit (10 pages), stopping")
-                break
+                if page_count >= 10:
+                    logger.warning(f"  Reached page limit (10 pages), stopping")
+                    break
 
-        logger.info(f"  Total fetched: {len(all_messages)} messages from Slack")
+            enriched = [msg for page in enriched_pages for msg in page.result()]
 
-        if not all_messages:
+        logger.info(f"  Total fetched: {total_fetched} messages from Slack")
+
+        if not total_fetched:
             logger.info(f"  No new messages to sync")
             _tracker.record_success()
             return
 
-        enriched = service.enrich_messages(all_messages, channel_id)
         logger.info(f"  Enriched {len(enriched)} user messages")
 
         if not enriched:
@@ -82,17 +118,28 @@ def sync_job(channel_id: str):
             _tracker.record_success()
             return
 
-        embeddings = service.batch_embed(enriched)
-        logger.info(f"  Generated {len(embeddings)} embeddings")
+        new_messages = service.filter_new_messages(enriched)
+        logger.info(
+            f"  {len(new_messages)} new or edited "
+            f"({len(enriched) - len(new_messages)} already stored)"
+        )
+
+        count = 0
+        if new_messages:
+            embeddings = service.batch_embed(new_messages)
+            logger.info(f"  Generated {len(embeddings)} embeddings")
 
-        count = service.upsert_to_db(enriched, embeddings)
+            count = service.upsert_to_db(new_messages, embeddings)
         logger.info(f"[{timestamp}] Sync complete: {count} messages synced")
 
+        if db_pool is not None:
+            logger.info(f"  Postgres pool: {bulk_copy.pool_stats(db_pool)}")
+
         if enriched:
             newest_ts = max(msg['timestamp'] for msg in enriched)
             sync_state[channel_id] = {
                 'last_message_ts': newest_ts,
-                'last_sync_at': datetime.now().isoformat()
+                'last_sync_at': time.time()
             }
 
             try:
@@ -120,12 +167,27 @@ def sync_job(channel_id: str):
 
 
 class SyncScheduler:
-    """Runs sync jobs on a schedule. Jobs persist across restarts."""
+    """Runs sync jobs on a schedule. The schedule persists across restarts."""
+
+    def __init__(self, db_path: Optional[str] = None, schedule_file: Path = SCHEDULE_FILE):
+        """Create scheduler.
+
+        By default jobs live in memory and the schedule (channel -> interval)
+        is kept in schedule_file, which is enough for one node with a handful
+        of channels. Pass db_path to use APScheduler's SQLite job store
+        instead, e.g. when jobs are added and removed at runtime and their
+        next-run times must survive restarts.
+        """
+        if db_path:
+            from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+            jobstore = SQLAlchemyJobStore(url=f'sqlite:///{db_path}')
+            self._schedule_file = None
+        else:
+            jobstore = MemoryJobStore()
+            self._schedule_file = schedule_file
 
-    def __init__(self, db_path: str = 'jobs.sqlite'):
-        """Create scheduler that saves jobs to SQLite."""
         jobstores = {
-            'default': SQLAlchemyJobStore(url=f'sqlite:///{db_path}')
+            'default': jobstore
         }
 
         executors = {
@@ -145,9 +207,43 @@ class SyncScheduler:
         )
 
         self._running = False
+        self._schedule = {}
+
+        # Open the pool up front so connection problems surface at startup
+        if _get_db_pool() is not None:
+            logger.info("Database writes routed through Supavisor pool")
+
+        if self._schedule_file is None:
+            logger.info(f"Scheduler initialized with database: {db_path}")
+        else:
+            self._schedule = self._load_schedule()
+            for channel_id, interval_minutes in list(self._schedule.items()):
+                try:
+                    self.add_hourly_sync(channel_id, interval_minutes=interval_minutes)
+                except ValueError as e:
+                    logger.warning(f"Dropping saved schedule for {channel_id}: {e}")
+                    del self._schedule[channel_id]
+            logger.info(f"Scheduler initialized with schedule file: {self._schedule_file}")
+
+    def _load_schedule(self) -> dict:
+        """Saved channel -> interval_minutes mapping, empty if missing or unreadable."""
+        if not self._schedule_file.exists():
+            return {}
+        try:
+            with open(self._schedule_file) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load schedule: {e}, starting empty")
+            return {}
+
+    def _save_schedule(self):
+        try:
+            self._schedule_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._schedule_file, 'w') as f:
+                json.dump(self._schedule, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Failed to save schedule: {e}")
 
-        logger.info(f"Scheduler initialized with database: {db_path}")
-    
     def add_hourly_sync(self, channel_id: str, interval_minutes: int = 60):
         """Schedule periodic sync for a channel."""
         job_id = f'sync_{channel_id}'
@@ -172,6 +268,10 @@ class SyncScheduler:
             name=f'Sync {channel_id} every {unit}'
         )
 
+        if self._schedule_file is not None and self._schedule.get(channel_id) != interval_minutes:
+            self._schedule[channel_id] = interval_minutes
+            self._save_schedule()
+
         logger.info(f"Scheduled sync for {channel_id} every {unit}")
     
     def start(self):
@@ -200,4 +300,7 @@ class SyncScheduler:
         logger.info("Stopping scheduler...")
         self._running = False
         self.scheduler.shutdown(wait=True)
+        bulk_copy.close_pools()
+        _get_service.cache_clear()
+        _tracker.flush()
         logger.info("Scheduler stopped")
@@ -0,0 +1,143 @@
+"""Near-duplicate query cache for search results.
+
+Queries like "auth bug" and "authentication bug" embed to almost the same
+vector, so they can share one set of results. Embeddings are bucketed with
+random-hyperplane LSH (a few independent tables of sign bits); a lookup only
+computes exact cosine against entries that share a bucket in some table.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray
+    limit: int
+    results: List[Dict]
+    stored_at: float
+
+
+class SemanticCache:
+    """
+    Cache of search results keyed by approximate query embedding.
+
+    A hit needs cosine similarity >= threshold with a stored query that used
+    the same limit, and an entry younger than ttl_seconds. When
+    invalidate_on is given, the whole cache is dropped whenever that file's
+    mtime changes (upsert_to_db touches config.messages_updated_file after
+    storing messages), so results never outlive the data they were computed from.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        threshold: float = 0.95,
+        ttl_seconds: float = 900,
+        max_entries: int = 1024,
+        n_tables: int = 4,
+        n_bits: int = 8,
+        invalidate_on: Optional[Path] = None,
+        seed: int = 0
+    ):
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_tables, dimensions, n_bits)).astype(np.float32)
+        self._weights = 1 << np.arange(n_bits, dtype=np.int64)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.invalidate_on = invalidate_on
+        self._tables: List[Dict[int, List[_Entry]]] = [{} for _ in range(n_tables)]
+        self._entries: List[_Entry] = []
+        self._source_mtime = self._mtime()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _mtime(self) -> Optional[int]:
+        if self.invalidate_on is None:
+            return None
+        try:
+            # Nanoseconds: two writes within one second must still differ
+            return self.invalidate_on.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _signatures(self, unit: np.ndarray) -> List[int]:
+        bits = np.einsum('d,tdb->tb', unit, self._planes) > 0
+        return [int(code) for code in bits.astype(np.int64) @ self._weights]
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        for table in self._tables:
+            table.clear()
+        self._entries.clear()
+
+    def _check_source(self):
+        mtime = self._mtime()
+        if mtime != self._source_mtime:
+            if self._entries:
+                logger.info(f"Semantic cache cleared: {self.invalidate_on} changed")
+            self._source_mtime = mtime
+            self._clear()
+
+    def get(self, embedding, limit: int) -> Optional[List[Dict]]:
+        """Results of a stored near-duplicate query, or None."""
+        unit = self._unit(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._check_source()
+
+            best, best_similarity = None, self.threshold
+            for table, signature in zip(self._tables, self._signatures(unit)):
+                for entry in table.get(signature, ()):
+                    if entry.limit != limit or now - entry.stored_at > self.ttl_seconds:
+                        continue
+                    similarity = float(entry.embedding @ unit)
+                    if similarity >= best_similarity:
+                        best, best_similarity = entry, similarity
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best.results
+
+    def put(self, embedding, limit: int, results: List[Dict]):
+        unit = self._unit(embedding)
+        entry = _Entry(unit, limit, results, time.time())
+
+        with self._lock:
+            self._check_source()
+            if len(self._entries) >= self.max_entries:
+                # Oldest entries go first; rebuilding the small tables is cheaper
+                # than tracking per-bucket positions
+                self._entries = self._entries[len(self._entries) // 2:]
+                for table in self._tables:
+                    table.clear()
+                for kept in self._entries:
+                    self._index(kept)
+
+            self._entries.append(entry)
+            self._index(entry)
+
+    def _index(self, entry: _Entry):
+        for table, signature in zip(self._tables, self._signatures(entry.embedding)):
+            table.setdefault(signature, []).append(entry)
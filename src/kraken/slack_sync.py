@@ -1,7 +1,16 @@
 """Slack integration with batch user enrichment and retry logic."""
 
+import hashlib
+import json
 import logging
-from typing import List, Dict, Tuple, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, Dict, Tuple, Optional
+import orjson
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
@@ -9,20 +18,183 @@ from kraken.retry import with_retry
 
 logger = logging.getLogger(__name__)
 
+SLACK_MESSAGE_COLUMNS = (
+    'slack_message_id', 'content', 'author', 'channel', 'timestamp',
+    'thread_ts', 'permalink', 'embedding', 'metadata', 'content_hash'
+)
+SLACK_MESSAGE_TYPES = (
+    'text', 'text', 'text', 'text', 'timestamptz',
+    'text', 'text', 'vector', 'jsonb', 'text'
+)
+
+# Hashes per `content_hash IN (...)` lookup; keeps the PostgREST URL well under limits
+HASH_LOOKUP_CHUNK = 200
+
+USER_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# batch_embed defaults: small requests in parallel, so one slow or failed
+# request only delays (and retries) its own 256 texts
+EMBED_BATCH_SIZE = 256
+EMBED_MAX_CONCURRENCY = 4
+
+# Shared across SlackSyncService instances so scheduler ticks (one service per
+# tick) reuse the users.list result until it is USER_CACHE_TTL_SECONDS old.
+_shared_user_map: Optional[Dict[str, str]] = None
+_shared_user_map_fetched_at = 0.0
+_shared_user_map_lock = threading.Lock()
+
+
+def _drop_bad_dimensions(
+    messages: List[Dict],
+    embeddings: List[List[float]],
+    dimensions: int
+) -> Tuple[List[Dict], List[List[float]]]:
+    """Keep only rows whose embedding matches the vector(dimensions) column; warn once per call."""
+    keep = [i for i, embedding in enumerate(embeddings) if len(embedding) == dimensions]
+    if len(keep) == len(embeddings):
+        return messages, embeddings
+
+    logger.warning(
+        f"Skipping {len(embeddings) - len(keep)} of {len(embeddings)} messages: "
+        f"embedding length differs from {dimensions}"
+    )
+    return [messages[i] for i in keep], [embeddings[i] for i in keep]
+
+
+def _unit_rows(embeddings: List[List[float]]):
+    """Embeddings as an (N, D) float32 array of unit rows.
+
+    OpenAI embeddings are close to unit length but not exactly; normalizing
+    once here means cosine similarity on stored rows is a plain dot product.
+    """
+    import numpy as np
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.size:
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix
+
+
+@lru_cache(maxsize=1)
+def _get_supabase():
+    """Process-wide Supabase client, so every sync reuses one HTTP connection pool."""
+    from supabase import create_client
+    from kraken.config import config
+    return create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
+
+
+@lru_cache(maxsize=1)
+def _get_openai():
+    """Process-wide OpenAI client (kept-alive connections across batches and syncs)."""
+    from openai import OpenAI
+    from kraken.config import config
+    return OpenAI(api_key=config.OPENAI_API_KEY)
+
+
+def _vector_literal(embedding) -> str:
+    """pgvector text form ('[0.1,0.2,...]') via orjson; much faster than letting
+    the PostgREST client json-encode 1536 Python floats per row."""
+    return orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def _message_timestamp(msg: Dict) -> datetime:
+    """Slack ts ('1700000000.123456') as a UTC-aware datetime, shared by both DB writers."""
+    return datetime.fromtimestamp(float(msg['timestamp']), tz=timezone.utc)
+
+
+def _mark_messages_updated() -> None:
+    """Bump the messages_updated marker so caches of search results (the MCP
+    server's semantic cache) drop answers computed before this write."""
+    from kraken.config import config
+
+    try:
+        marker = config.messages_updated_file
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    except OSError as e:
+        logger.warning(f"Failed to touch {config.messages_updated_file}: {e}")
+
+
+def content_hash(slack_message_id: str, content: str, author: str) -> str:
+    """Fingerprint of a stored message version; changes when the message is edited."""
+    key = f"{slack_message_id}\x00{author}\x00{content}".encode()
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+
+def load_user_cache(path: Path) -> int:
+    """Load a user map saved by save_user_cache. Returns number of users loaded (0 if missing/stale)."""
+    global _shared_user_map, _shared_user_map_fetched_at
+
+    if not path.exists():
+        return 0
+
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load user cache: {e}")
+        return 0
+
+    fetched_at = float(data.get('fetched_at', 0))
+    if time.time() - fetched_at > USER_CACHE_TTL_SECONDS:
+        return 0
+
+    with _shared_user_map_lock:
+        _shared_user_map = data.get('users', {})
+        _shared_user_map_fetched_at = fetched_at
+
+    return len(_shared_user_map)
+
+
+def save_user_cache(path: Path) -> None:
+    """Persist the shared user map so a restart within the TTL skips users.list."""
+    with _shared_user_map_lock:
+        if _shared_user_map is None:
+            return
+        data = {'fetched_at': _shared_user_map_fetched_at, 'users': _shared_user_map}
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+    except Exception as e:
+        logger.warning(f"Failed to save user cache: {e}")
+
 
 class SlackSyncService:
     """Slack message fetching, enrichment, embedding, and storage."""
 
-    def __init__(self, slack_token: str):
-        """Initialize Slack client."""
+    def __init__(self, slack_token: str, db_pool=None):
+        """Initialize Slack client.
+
+        db_pool, if given, is a psycopg_pool.ConnectionPool used for COPY upserts
+        instead of opening a connection to SUPABASE_DB_URL per call.
+        """
         self.client = WebClient(token=slack_token)
         self._user_cache: Optional[Dict[str, str]] = None
+        self._user_cache_fetched_at = 0.0
+        self._db_pool = db_pool
     
     def _get_user_map(self) -> Dict[str, str]:
         """Fetch all workspace users once, cache in memory. Maps user_id -> real_name."""
-        if self._user_cache is not None:
+        global _shared_user_map, _shared_user_map_fetched_at
+
+        # Long-lived services (the scheduler keeps one) refresh after the TTL too
+        if (
+            self._user_cache is not None
+            and time.time() - self._user_cache_fetched_at < USER_CACHE_TTL_SECONDS
+        ):
             return self._user_cache
 
+        with _shared_user_map_lock:
+            if (
+                _shared_user_map is not None
+                and time.time() - _shared_user_map_fetched_at < USER_CACHE_TTL_SECONDS
+            ):
+                self._user_cache = _shared_user_map
+                self._user_cache_fetched_at = _shared_user_map_fetched_at
+                return self._user_cache
+
         try:
             response = with_retry(
                 lambda: self.client.users_list(),
@@ -36,6 +208,11 @@ class SlackSyncService:
                 if not user.get('deleted', False)
             }
 
+            self._user_cache_fetched_at = time.time()
+            with _shared_user_map_lock:
+                _shared_user_map = self._user_cache
+                _shared_user_map_fetched_at = self._user_cache_fetched_at
+
             print(f"Cached {len(self._user_cache)} users")
             return self._user_cache
 
@@ -43,6 +220,10 @@ class SlackSyncService:
             print(f"Warning: Failed to fetch user list after retries: {e}")
             return {}
     
+    def warm_user_cache(self) -> None:
+        """Populate the user map ahead of enrich_messages (safe to run in a worker thread)."""
+        self._get_user_map()
+
     def fetch_messages(
         self,
         channel_id: str,
@@ -85,9 +266,12 @@ class SlackSyncService:
             timestamp = msg.get('ts', '0')
             permalink = f"https://slack.com/archives/{channel_id}/p{timestamp.replace('.', '')}"
 
+            slack_message_id = f"{channel_id}_{timestamp}"
+
             enriched.append({
-                'slack_message_id': f"{channel_id}_{timestamp}",
+                'slack_message_id': slack_message_id,
                 'content': msg['text'],
+                'content_hash': content_hash(slack_message_id, msg['text'], author),
                 'author': author,
                 'channel': channel_id,
                 'timestamp': timestamp,
@@ -101,38 +285,139 @@ class SlackSyncService:
 
         return enriched
     
-    def batch_embed(self, messages: List[Dict]) -> List[List[float]]:
-        """Generate embeddings for messages in batch."""
-        from openai import OpenAI
+    def filter_new_messages(self, messages: List[Dict]) -> List[Dict]:
+        """Drop messages whose exact version (content_hash) is already in slack_messages."""
+        if not messages:
+            return []
+
+        client = _get_supabase()
+        hashes = list({msg['content_hash'] for msg in messages})
+        known = set()
+
+        for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+            chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+            result = with_retry(
+                lambda: client.table('slack_messages')
+                    .select('content_hash')
+                    .in_('content_hash', chunk)
+                    .execute(),
+                max_retries=3,
+                operation_name="Supabase slack_messages content_hash lookup"
+            )
+            known.update(row['content_hash'] for row in result.data)
+
+        return [msg for msg in messages if msg['content_hash'] not in known]
+
+    def batch_embed(
+        self,
+        messages: List[Dict],
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> List[List[float]]:
+        """Generate embeddings in batches, retrying each batch independently. Preserves input order.
+
+        Texts already in the persistent embedding cache (same model and text,
+        e.g. re-synced or reprocessed messages) are not sent to OpenAI.
+        Repeated texts are embedded once. on_progress, if given, is called with the
+        number of messages each batch covers as it completes.
+        """
         from kraken.config import config
+        from kraken.embeddings import embedding_cache
 
-        client = OpenAI(api_key=config.OPENAI_API_KEY)
-        texts = [msg['content'] for msg in messages]
+        model = config.OPENAI_EMBEDDING_MODEL
+        all_texts = [msg['content'] for msg in messages]
+        embeddings: List[Optional[List[float]]] = [None] * len(all_texts)
 
-        response = with_retry(
-            lambda: client.embeddings.create(
-                model=config.OPENAI_EMBEDDING_MODEL,
-                input=texts
-            ),
-            max_retries=3,
-            operation_name="OpenAI embeddings.create"
-        )
+        keys: List[str] = []
+        if embedding_cache:
+            keys = [embedding_cache.key(text, model) for text in all_texts]
+            embeddings = embedding_cache.get_many(keys)
+            cached = sum(1 for embedding in embeddings if embedding is not None)
+            if cached:
+                logger.info(f"  {cached}/{len(all_texts)} embeddings served from cache")
+                if on_progress:
+                    on_progress(cached)
+
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not misses:
+            return embeddings
+
+        client = _get_openai()
+        # Each distinct text is embedded (and billed) once, however often it repeats
+        positions: Dict[str, List[int]] = {}
+        for i in misses:
+            positions.setdefault(all_texts[i], []).append(i)
+        texts = list(positions)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        def embed_batch(index: int) -> List[List[float]]:
+            response = with_retry(
+                lambda: client.embeddings.create(
+                    model=model,
+                    input=batches[index]
+                ),
+                max_retries=5,
+                operation_name=f"OpenAI embeddings.create (batch {index + 1}/{len(batches)})"
+            )
+            batch_embeddings = [item.embedding for item in response.data]
+            if any(len(embedding) != config.EMBEDDING_DIMENSIONS for embedding in batch_embeddings):
+                raise ValueError(
+                    f"{config.OPENAI_EMBEDDING_MODEL} returned {len(batch_embeddings[0])}-dim embeddings, "
+                    f"expected EMBEDDING_DIMENSIONS={config.EMBEDDING_DIMENSIONS}"
+                )
+            return batch_embeddings
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            for batch, batch_embeddings in zip(batches, executor.map(embed_batch, range(len(batches)))):
+                filled = 0
+                for text, embedding in zip(batch, batch_embeddings):
+                    for i in positions[text]:
+                        embeddings[i] = embedding
+                    filled += len(positions[text])
+                if embedding_cache:
+                    embedding_cache.set_many(
+                        [keys[positions[text][0]] for text in batch],
+                        batch,
+                        model,
+                        batch_embeddings
+                    )
+                if on_progress:
+                    on_progress(filled)
 
-        embeddings = [item.embedding for item in response.data]
         return embeddings
     
-    def upsert_to_db(self, messages: List[Dict], embeddings: List[List[float]]) -> int:
-        """Insert messages with embeddings into Supabase (idempotent upsert)."""
-        from supabase import create_client
+    def upsert_to_db(
+        self,
+        messages: List[Dict],
+        embeddings: List[List[float]],
+        chunk_size: int = 1000,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Insert messages with embeddings into Supabase (idempotent upsert), chunk_size rows per request.
+
+        Uses binary COPY when a db_pool was given or SUPABASE_DB_URL is set, PostgREST otherwise.
+        on_progress, if given, is called with the row count of each chunk once it is written.
+        """
         from kraken.config import config
-        from datetime import datetime
 
-        client = create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
+        # Validate once here so nothing downstream (COPY, search) needs per-row shape checks
+        messages, embeddings = _drop_bad_dimensions(messages, embeddings, config.EMBEDDING_DIMENSIONS)
+        embeddings = _unit_rows(embeddings)
+
+        if self._db_pool is not None or config.SUPABASE_DB_URL:
+            count = self._copy_upsert(config.SUPABASE_DB_URL, messages, embeddings)
+            if on_progress:
+                on_progress(len(messages))
+            if count:
+                _mark_messages_updated()
+            return count
+
+        client = _get_supabase()
 
         rows = []
         for msg, embedding in zip(messages, embeddings):
-            slack_ts = float(msg['timestamp'])
-            pg_timestamp = datetime.fromtimestamp(slack_ts).isoformat()
+            pg_timestamp = _message_timestamp(msg).isoformat()
 
             rows.append({
                 'slack_message_id': msg['slack_message_id'],
@@ -142,17 +427,69 @@ class SlackSyncService:
                 'timestamp': pg_timestamp,
                 'thread_ts': msg.get('thread_ts'),
                 'permalink': msg.get('permalink'),
-                'embedding': embedding,
-                'metadata': msg.get('metadata', {})
+                'embedding': _vector_literal(embedding),
+                'metadata': msg.get('metadata', {}),
+                'content_hash': msg.get('content_hash')
             })
 
-        result = with_retry(
-            lambda: client.table('slack_messages').upsert(
-                rows,
-                on_conflict='slack_message_id'
-            ).execute(),
+        count = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            result = with_retry(
+                lambda: client.table('slack_messages').upsert(
+                    chunk,
+                    on_conflict='slack_message_id'
+                ).execute(),
+                max_retries=3,
+                operation_name="Supabase slack_messages.upsert"
+            )
+            count += len(result.data)
+            if on_progress:
+                on_progress(len(chunk))
+
+        if count:
+            _mark_messages_updated()
+        return count
+
+    def _copy_upsert(self, db_url: str, messages: List[Dict], embeddings: List[List[float]]) -> int:
+        """Upsert over a direct Postgres connection using binary COPY."""
+        import numpy as np
+        from kraken import bulk_copy
+
+        rows = [
+            (
+                msg['slack_message_id'],
+                msg['content'],
+                msg['author'],
+                msg['channel'],
+                _message_timestamp(msg),
+                msg.get('thread_ts'),
+                msg.get('permalink'),
+                np.asarray(embedding, dtype=np.float32),
+                msg.get('metadata', {}),
+                msg.get('content_hash')
+            )
+            for msg, embedding in zip(messages, embeddings)
+        ]
+
+        def write() -> int:
+            if self._db_pool is not None:
+                connection = self._db_pool.connection()
+            else:
+                connection = bulk_copy.connect(db_url)
+
+            with connection as conn:
+                return bulk_copy.upsert_rows(
+                    conn,
+                    'slack_messages',
+                    columns=SLACK_MESSAGE_COLUMNS,
+                    types=SLACK_MESSAGE_TYPES,
+                    rows=rows,
+                    conflict_column='slack_message_id'
+                )
+
+        return with_retry(
+            write,
             max_retries=3,
-            operation_name="Supabase slack_messages.upsert"
+            operation_name="Postgres slack_messages COPY upsert"
         )
-
-        return len(result.data)
@@ -1,76 +1,146 @@
 """Track sync success/failure for monitoring and alerting."""
 
-import json
+import atexit
 import logging
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
+FAILURE_WINDOW_SECONDS = 24 * 60 * 60
+
+
+def _isoformat(ts) -> Optional[str]:
+    """Unix timestamp -> ISO string for display; ISO strings from older state files pass through."""
+    if ts is None or isinstance(ts, str):
+        return ts
+    return datetime.fromtimestamp(ts).isoformat()
+
 
 class SyncTracker:
     """Track sync outcomes for reliability monitoring. Alerts on repeated failures."""
 
     def __init__(self, state_file: Path = None):
-        """Initialize tracker."""
+        """Initialize tracker.
+
+        Outcomes are kept in memory and written to disk by flush(), which
+        should_alert() calls and which also runs at interpreter exit.
+        """
         self.state_file = state_file or Path('.cache') / 'sync_state.json'
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        # Failure timestamps go to an append-only log (one per line) so a failure
+        # appends a few bytes instead of rewriting the whole state file
+        self.failures_log = self.state_file.with_name('failures.log')
         self._state = self._load()
+        legacy = self._state.pop('failures_24h', None)
+        self._failures = self._load_failures(legacy or [])
+        # Rewrite a pre-log state file so its failures are not imported twice
+        self._dirty = legacy is not None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
     
     def _load(self) -> dict:
         """Load state from disk."""
         if self.state_file.exists():
             try:
-                with open(self.state_file) as f:
-                    return json.load(f)
+                return orjson.loads(self.state_file.read_bytes())
             except Exception as e:
                 logger.warning(f"Failed to load sync state: {e}")
 
         return {
             'last_success': None,
             'last_failure': None,
-            'consecutive_failures': 0,
-            'failures_24h': []
+            'consecutive_failures': 0
         }
 
+    def _load_failures(self, legacy: list) -> deque:
+        """Read the failure log, keep the last 24h, and compact the file to match.
+
+        legacy holds failures_24h from a state file written before the log existed.
+        """
+        timestamps = list(legacy)
+        if self.failures_log.exists():
+            try:
+                timestamps.extend(
+                    float(line) for line in self.failures_log.read_text().split()
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load failure log: {e}")
+
+        cutoff = time.time() - FAILURE_WINDOW_SECONDS
+        failures = deque(sorted(ts for ts in timestamps if ts > cutoff))
+
+        if legacy or len(failures) != len(timestamps):
+            try:
+                self.failures_log.write_text(''.join(f"{ts}\n" for ts in failures))
+            except Exception as e:
+                logger.warning(f"Failed to compact failure log: {e}")
+
+        return failures
+
+    def _append_failure(self, ts: float):
+        try:
+            with open(self.failures_log, 'a') as f:
+                f.write(f"{ts}\n")
+        except Exception as e:
+            logger.warning(f"Failed to append to failure log: {e}")
+
     def _save(self):
         """Save state to disk."""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self._state, f, indent=2)
+            self.state_file.write_bytes(orjson.dumps(self._state))
         except Exception as e:
             logger.warning(f"Failed to save sync state: {e}")
-    
+
+    def flush(self):
+        """Write state to disk if anything was recorded since the last write."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def _prune_failures(self, now: float):
+        """Drop failure timestamps older than 24h (oldest are on the left)."""
+        failures = self._failures
+        cutoff = now - FAILURE_WINDOW_SECONDS
+        while failures and failures[0] <= cutoff:
+            failures.popleft()
+
     def record_success(self):
         """Record successful sync. Resets consecutive failure counter."""
-        self._state['last_success'] = datetime.now().isoformat()
-        self._state['consecutive_failures'] = 0
-        self._save()
+        with self._lock:
+            self._state['last_success'] = time.time()
+            self._state['consecutive_failures'] = 0
+            self._dirty = True
 
         logger.debug("Sync success recorded")
 
     def record_failure(self, error: str):
         """Record failed sync."""
-        now = datetime.now()
-        self._state['last_failure'] = now.isoformat()
-        self._state['consecutive_failures'] += 1
-
-        cutoff = (now - timedelta(days=1)).timestamp()
-        self._state['failures_24h'] = [
-            ts for ts in self._state.get('failures_24h', [])
-            if ts > cutoff
-        ]
-        self._state['failures_24h'].append(now.timestamp())
-
-        self._save()
+        now = time.time()
+        with self._lock:
+            self._state['last_failure'] = now
+            self._state['consecutive_failures'] += 1
+            self._prune_failures(now)
+            self._failures.append(now)
+            self._append_failure(now)
+            self._dirty = True
 
         logger.debug(f"Sync failure recorded: {error[:100]}")
     
     def should_alert(self) -> Optional[str]:
-        """Check if we should alert on failures."""
-        consecutive = self._state['consecutive_failures']
-        failures_24h = len(self._state.get('failures_24h', []))
+        """Check if we should alert on failures. Flushes pending state to disk."""
+        with self._lock:
+            self._prune_failures(time.time())
+            consecutive = self._state['consecutive_failures']
+            failures_24h = len(self._failures)
+        self.flush()
 
         if consecutive >= 3:
             return f"🚨 ALERT: {consecutive} consecutive sync failures - check config/auth"
@@ -82,9 +152,11 @@ class SyncTracker:
 
     def get_stats(self) -> dict:
         """Get current sync statistics."""
-        return {
-            'last_success': self._state.get('last_success'),
-            'last_failure': self._state.get('last_failure'),
-            'consecutive_failures': self._state['consecutive_failures'],
-            'failures_24h': len(self._state.get('failures_24h', []))
-        }
+        with self._lock:
+            self._prune_failures(time.time())
+            return {
+                'last_success': _isoformat(self._state.get('last_success')),
+                'last_failure': _isoformat(self._state.get('last_failure')),
+                'consecutive_failures': self._state['consecutive_failures'],
+                'failures_24h': len(self._failures)
+            }
@@ -1,16 +1,51 @@
-import json
-from typing import List, Dict, Optional
-import numpy as np
-from supabase import create_client, Client
+import asyncio
+from typing import List, Dict, Optional, Union
+from supabase import acreate_client, create_client, AsyncClient, Client
 
 from kraken.config import config
-from kraken.retry import with_retry
+from kraken.retry import with_retry, with_retry_async
 
 
 class VectorStore:
     def __init__(self, table_name: str = "slack_messages"):
         self.client: Client = create_client(config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY)
         self.table_name = table_name
+        # Created on first search_async, inside the running event loop
+        self._async_client: Optional[AsyncClient] = None
+        self._async_client_lock = asyncio.Lock()
+
+    async def _get_async_client(self) -> AsyncClient:
+        if self._async_client is None:
+            async with self._async_client_lock:
+                if self._async_client is None:
+                    self._async_client = await acreate_client(
+                        config.SUPABASE_URL, config.SUPABASE_SERVICE_KEY
+                    )
+        return self._async_client
+
+    def _match_rpc(
+        self,
+        client: Union[Client, AsyncClient],
+        query_embedding: List[float],
+        limit: int,
+        min_similarity: float,
+        table_name: Optional[str]
+    ):
+        """Unexecuted match_<table> RPC request on client (sync or async) and its function name.
+
+        Each table has a match_<table> SQL function (see docs/DEPLOYMENT.md),
+        so only the top `limit` rows ever leave Postgres.
+        """
+        function = f"match_{table_name or self.table_name}"
+        request = client.rpc(
+            function,
+            {
+                'query_embedding': query_embedding,
+                'match_threshold': min_similarity,
+                'match_count': limit
+            }
+        )
+        return request, function
 
     def search(
         self,
@@ -20,19 +55,32 @@ class VectorStore:
         table_name: Optional[str] = None
     ) -> List[Dict]:
         """Search for similar messages using pgvector RPC (server-side)."""
-        table = table_name or self.table_name
+        request, function = self._match_rpc(self.client, query_embedding, limit, min_similarity, table_name)
 
         result = with_retry(
-            lambda: self.client.rpc(
-                'match_slack_messages',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': min_similarity,
-                    'match_count': limit
-                }
-            ).execute(),
+            request.execute,
+            max_retries=3,
+            operation_name=f"Supabase {function} RPC"
+        )
+
+        return result.data
+
+    async def search_async(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        min_similarity: float = 0.35,
+        table_name: Optional[str] = None
+    ) -> List[Dict]:
+        """search() on the async Supabase client: the RPC is awaited and retries
+        back off with asyncio.sleep, so one slow search never blocks the event loop."""
+        client = await self._get_async_client()
+        request, function = self._match_rpc(client, query_embedding, limit, min_similarity, table_name)
+
+        result = await with_retry_async(
+            request.execute,
             max_retries=3,
-            operation_name="Supabase match_slack_messages RPC"
+            operation_name=f"Supabase {function} RPC"
         )
 
         return result.data
@@ -42,13 +90,12 @@ vector_store = VectorStore()
 
 if __name__ == "__main__":
     from kraken.embeddings import generate_embedding
-    import asyncio
 
     async def test():
         store = VectorStore(table_name="slack_messages")
         query = "authentication bug"
         embedding, _, _ = await generate_embedding(query)
-        results = store.search(embedding, limit=3)
+        results = await store.search_async(embedding, limit=3)
 
         print(f"Query: {query}")
         print(f"Results: {len(results)}")